@@ -1,98 +1,200 @@
 #!/usr/bin/env python3
 import os
+import re
 import json
-import glob
-import pandas as pd
-from datasets import Dataset, DatasetDict
+import pyarrow as pa
+from datasets import Dataset, DatasetDict, Features, Value
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+
+# Prefer a C JSON parser for the per-file loads, falling back to the stdlib
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    try:
+        import ujson
+        _json_loads = ujson.loads
+    except ImportError:
+        # Reuse one decoder instead of building a new one per json.loads call
+        _json_decoder = json.JSONDecoder()
+        
+        def _json_loads(data):
+            if isinstance(data, bytes):
+                data = data.decode('utf-8')
+            return _json_decoder.decode(data)
 
 # Configure paths
 CLEANED_FORUM_DIR = "/home/sai/Desktop/factorio/pratincole/wiki/cleaned_forum_all"
 OUTPUT_DIR = "/home/sai/Desktop/factorio/pratincole/wiki/huggingface_dataset"
 DATASET_NAME = "factorio-forum"
 
+# All loaded topics are cached in one Arrow file so later runs can skip the
+# per-file reads. The cache is rebuilt when CLEANED_FORUM_DIR or any topic
+# file in it is newer, i.e. after topic files are added, removed, renamed or
+# rewritten.
+TOPICS_CACHE = os.path.join(OUTPUT_DIR, "topics.arrow")
+
+# The saved split is written as up to NUM_SHARDS shards by up to SAVE_NUM_PROC workers
+NUM_SHARDS = 16
+SAVE_NUM_PROC = min(8, os.cpu_count() or 1)
+
+# Topics with no posts are small files ending in an empty "posts" list; files up
+# to this size are checked for that before being parsed
+EMPTY_TOPIC_MAX_BYTES = 1024
+_EMPTY_POSTS_RE = re.compile(rb'"posts":\s*\[\s*\]\s*\}\s*\Z')
+
+# Dataset schema, declared up front so the columns are not re-scanned for type
+# inference. Responses and their quotes are lists of structs.
+FORUM_FEATURES = Features({
+    "id": Value("string"),
+    "topic_id": Value("string"),
+    "title": Value("string"),
+    "section": Value("string"),
+    "url": Value("string"),
+    "author": Value("string"),
+    "question": Value("large_string"),
+    "responses": [{
+        "author": Value("string"),
+        "date": Value("string"),
+        "content": Value("large_string"),
+        "quotes": [{
+            "author": Value("string"),
+            "content": Value("string")
+        }]
+    }],
+    "response_count": Value("int32"),
+    "timestamp": Value("string")
+})
+
+# Authors, sections and dates repeat across thousands of entries, so keep a
+# single shared str object per distinct value
+_interned = {}
+
+def _memo(value):
+    """Return the shared instance of a repeated string value"""
+    return _interned.setdefault(value, value)
+
+def _read_file(entry):
+    """Read a whole file (an os.DirEntry) with a single unbuffered read sized from stat()"""
+    fd = os.open(entry.path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        return os.read(fd, entry.stat().st_size)
+    finally:
+        os.close(fd)
+
+def _process_topic_file(entry):
+    """Load a single cleaned topic file (an os.DirEntry) and turn it into a dataset entry"""
+    try:
+        data = _read_file(entry)
+        
+        # Skip empty topics without parsing them when the raw bytes make it obvious
+        if len(data) <= EMPTY_TOPIC_MAX_BYTES and _EMPTY_POSTS_RE.search(data):
+            return None
+        
+        forum_json = _json_loads(data)
+        
+        # Extract topic info
+        topic_info = forum_json.get("topic_info", {})
+        posts = forum_json.get("posts", [])
+        
+        # Skip empty topics (sometimes there are redirects that have no content)
+        if len(posts) == 0:
+            return None
+        
+        # Get first post (original question/topic)
+        first_post = posts[0]
+        remaining_posts = posts[1:]
+        
+        # Create dataset entry
+        topic_id = entry.name[len("topic_"):-len(".json")]
+        
+        # Extract the first post content (often the question or main topic)
+        first_post_author = _memo(first_post.get("author", ""))
+        first_post_content = first_post.get("content", "")
+        
+        # Responses reuse the parsed post dicts rather than copying each one;
+        # FORUM_FEATURES keeps only author/date/content/quotes when the dataset
+        # is built, so extra keys like post_id are dropped there
+        responses = remaining_posts
+        for post in responses:
+            post["author"] = _memo(post.get("author", ""))
+            post["date"] = _memo(post.get("date", ""))
+            post.setdefault("content", "")
+            post.setdefault("quotes", [])
+        
+        # Create dataset entry
+        return {
+            "id": f"forum-topic-{topic_id}",
+            "topic_id": topic_id,
+            "title": topic_info.get("title", ""),
+            "section": _memo(topic_info.get("section", "")),
+            "url": topic_info.get("url", ""),
+            "author": first_post_author,
+            "question": first_post_content,
+            "responses": responses,
+            "response_count": len(responses),
+            "timestamp": topic_info.get("timestamp", "")
+        }
+        
+    except Exception as e:
+        print(f"Error processing {entry.path}: {e}")
+        return None
+
+def _topics_cache_is_fresh(forum_files):
+    """Return True if TOPICS_CACHE exists and is newer than CLEANED_FORUM_DIR and all forum_files"""
+    try:
+        cache_mtime = os.stat(TOPICS_CACHE).st_mtime
+        # The directory mtime covers added and removed files, the file
+        # mtimes cover files rewritten in place
+        newest = os.stat(CLEANED_FORUM_DIR).st_mtime
+        for entry in forum_files:
+            newest = max(newest, entry.stat().st_mtime)
+        return cache_mtime >= newest
+    except FileNotFoundError:
+        return False
+
+def _read_topics_cache():
+    """Load the cached topic entries from the memory-mapped Arrow file"""
+    with pa.memory_map(TOPICS_CACHE) as source:
+        return pa.ipc.open_file(source).read_all().to_pylist()
+
+def _write_topics_cache(forum_data):
+    """Write the topic entries to TOPICS_CACHE as a single Arrow IPC file"""
+    table = pa.Table.from_pylist(forum_data, schema=FORUM_FEATURES.arrow_schema)
+    
+    # Write to a temporary file first so an interrupted run never leaves a partial cache
+    tmp_path = TOPICS_CACHE + ".tmp"
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, TOPICS_CACHE)
+
 def load_forum_files():
     """Load and process cleaned forum files"""
     print("Loading forum files...")
-    forum_data = []
     
     # Get all forum JSON files - focusing only on topic_*.json files 
     # (better structured data than forum_* files)
-    forum_files = glob.glob(os.path.join(CLEANED_FORUM_DIR, "topic_*.json"))
+    forum_files = [e for e in os.scandir(CLEANED_FORUM_DIR)
+                   if e.name.startswith("topic_") and e.name.endswith(".json")]
+    
+    if _topics_cache_is_fresh(forum_files):
+        print(f"Loading forum topics from cache {TOPICS_CACHE}")
+        return _read_topics_cache()
+    
     total_files = len(forum_files)
     print(f"Found {total_files} forum topic files")
     
-    for i, file_path in enumerate(forum_files):
-        if i % 500 == 0:
-            print(f"Processing forum file {i+1}/{total_files}")
-            
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                forum_json = json.load(f)
-                
-                # Extract topic info
-                topic_info = forum_json.get("topic_info", {})
-                posts = forum_json.get("posts", [])
-                
-                # Skip empty topics (sometimes there are redirects that have no content)
-                if len(posts) == 0:
-                    continue
-                
-                # Create content from posts
-                content_parts = []
-                
-                # Get first post (original question/topic)
-                first_post = None
-                remaining_posts = []
-                
-                if posts:
-                    first_post = posts[0]
-                    remaining_posts = posts[1:]
-                
-                # Create dataset entry
-                topic_id = os.path.basename(file_path).replace("topic_", "").replace(".json", "")
-                
-                # Extract the first post content (often the question or main topic)
-                first_post_content = ""
-                first_post_author = ""
-                if first_post:
-                    first_post_author = first_post.get("author", "")
-                    first_post_content = first_post.get("content", "")
-                
-                # Extract responses
-                responses = []
-                for post in remaining_posts:
-                    author = post.get("author", "")
-                    content = post.get("content", "")
-                    date = post.get("date", "")
-                    quotes = post.get("quotes", [])
-                    
-                    response = {
-                        "author": author,
-                        "date": date,
-                        "content": content,
-                        "quotes": quotes
-                    }
-                    responses.append(response)
-                
-                # Create dataset entry
-                entry = {
-                    "id": f"forum-topic-{topic_id}",
-                    "topic_id": topic_id,
-                    "title": topic_info.get("title", ""),
-                    "section": topic_info.get("section", ""),
-                    "url": topic_info.get("url", ""),
-                    "author": first_post_author,
-                    "question": first_post_content,
-                    "responses": responses,
-                    "response_count": len(responses),
-                    "timestamp": topic_info.get("timestamp", "")
-                }
-                
-                forum_data.append(entry)
-                
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
+    # Files are independent, so read and parse them on a thread pool
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = tqdm(executor.map(_process_topic_file, forum_files), total=total_files,
+                       desc="Processing forum files", mininterval=1.0, smoothing=0.05)
+        forum_data = [entry for entry in results if entry is not None]
+    
+    _write_topics_cache(forum_data)
+    print(f"Cached {len(forum_data)} forum topics to {TOPICS_CACHE}")
     
     return forum_data
 
@@ -105,20 +207,23 @@ def create_huggingface_dataset():
     forum_data = load_forum_files()
     print(f"Total entries: {len(forum_data)}")
     
-    # Convert to pandas DataFrame first
-    df = pd.DataFrame(forum_data)
-    
-    # Create Hugging Face Dataset - all in one split
-    full_dataset = Dataset.from_pandas(df)
+    # Create Hugging Face Dataset - all in one split, built straight from the
+    # entry dicts without a pandas intermediate
+    full_dataset = Dataset.from_list(forum_data, features=FORUM_FEATURES)
     
     # Create dataset dictionary with a single split
     dataset_dict = DatasetDict({
         'data': full_dataset
     })
     
-    # Save locally
+    # Save locally, writing shards in parallel
     local_path = os.path.join(OUTPUT_DIR, DATASET_NAME)
-    dataset_dict.save_to_disk(local_path)
+    num_shards = max(1, min(NUM_SHARDS, len(full_dataset)))
+    dataset_dict.save_to_disk(
+        local_path,
+        num_shards={'data': num_shards},
+        num_proc=min(SAVE_NUM_PROC, num_shards)
+    )
     print(f"Dataset saved locally to {local_path}")
     
     # Create README content
@@ -1,173 +1,245 @@
 #!/usr/bin/env python3
 import os
 import json
-import glob
-import pandas as pd
 from datasets import Dataset, DatasetDict, Features, Value, Sequence, load_dataset
 import argparse
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+
+# Prefer a C JSON parser for the per-file loads, falling back to the stdlib
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    try:
+        import ujson
+        _json_loads = ujson.loads
+    except ImportError:
+        # Reuse one decoder instead of building a new one per json.loads call
+        _json_decoder = json.JSONDecoder()
+        
+        def _json_loads(data):
+            if isinstance(data, bytes):
+                data = data.decode('utf-8')
+            return _json_decoder.decode(data)
 
 # Configure paths
 PARSED_WIKI_DIR = "/home/sai/Desktop/factorio/pratincole/wiki/parsed_wiki"
 CLEANED_FORUM_DIR = "/home/sai/Desktop/factorio/pratincole/wiki/cleaned_forum"
 OUTPUT_DIR = "/home/sai/Desktop/factorio/pratincole/wiki/huggingface_dataset"
 DATASET_NAME = "factorio-knowledge"
+WIKI_BASE_URL = "https://wiki.factorio.com/"
+
+# The saved split is written as up to NUM_SHARDS shards by up to SAVE_NUM_PROC workers
+NUM_SHARDS = 16
+SAVE_NUM_PROC = min(8, os.cpu_count() or 1)
+
+# Translation tables for converting between wiki titles and page names
+_SPACE_TO_UNDERSCORE = str.maketrans(" ", "_")
+_UNDERSCORE_TO_SPACE = str.maketrans("_", " ")
+
+# Categories and sections repeat across thousands of entries, so keep a
+# single shared str object per distinct value
+_interned = {}
 
-def load_wiki_files():
-    """Load and process parsed wiki files"""
+def _memo(value):
+    """Return the shared instance of a repeated string value"""
+    return _interned.setdefault(value, value)
+
+# Number of files handed to the thread pool at a time while streaming entries
+CHUNK_SIZE = 10_000
+
+# Dataset schema, declared up front so the generator output is not re-scanned
+KNOWLEDGE_FEATURES = Features({
+    "id": Value("string"),
+    "title": Value("string"),
+    "categories": Sequence(Value("string")),
+    "content": Value("large_string"),
+    "source": Value("string"),
+    "url": Value("string")
+})
+
+def _read_file(entry):
+    """Read a whole file (an os.DirEntry) with a single unbuffered read sized from stat()"""
+    fd = os.open(entry.path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+    try:
+        return os.read(fd, entry.stat().st_size)
+    finally:
+        os.close(fd)
+
+def _process_wiki_file(entry):
+    """Load a single parsed wiki file (an os.DirEntry) and turn it into a dataset entry"""
+    try:
+        content = _read_file(entry).decode('utf-8')
+        page_name = entry.name[:-len(".txt")]
+        
+        # Split content into metadata and text
+        parts = content.split("---\n", 2)
+        
+        if len(parts) >= 3:
+            metadata_str = parts[1].strip()
+            text_content = parts[2].strip()
+            
+            # Parse metadata
+            try:
+                metadata = _json_loads(metadata_str)
+            except ValueError:
+                metadata = {"title": entry.name, "categories": []}
+            
+            # Create dataset entry
+            title = metadata.get("title", "")
+            return {
+                "id": page_name,
+                "title": title,
+                "categories": [_memo(c) for c in metadata.get("categories", [])],
+                "content": text_content,
+                "source": "wiki",
+                "url": WIKI_BASE_URL + title.translate(_SPACE_TO_UNDERSCORE)
+            }
+        else:
+            # Handle files without proper metadata separators
+            return {
+                "id": page_name,
+                "title": page_name.translate(_UNDERSCORE_TO_SPACE),
+                "categories": [],
+                "content": content,
+                "source": "wiki",
+                "url": ""
+            }
+            
+    except Exception as e:
+        print(f"Error processing {entry.path}: {e}")
+        return None
+
+def _iter_entries(process_file, files, label):
+    """Yield the entries for files, mapping process_file over CHUNK_SIZE files at a time"""
+    total_files = len(files)
+    
+    # Files are independent, so read and parse them on a thread pool; working
+    # in chunks bounds how many finished entries are held in memory at once
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor, \
+            tqdm(total=total_files, desc=f"Processing {label} files",
+                 mininterval=1.0, smoothing=0.05) as progress:
+        for start in range(0, total_files, CHUNK_SIZE):
+            chunk = files[start:start + CHUNK_SIZE]
+            for entry in executor.map(process_file, chunk):
+                progress.update()
+                if entry is not None:
+                    yield entry
+
+def iter_wiki_entries():
+    """Yield dataset entries for the parsed wiki files"""
     print("Loading wiki files...")
-    wiki_data = []
     
     # Get all wiki text files
-    wiki_files = glob.glob(os.path.join(PARSED_WIKI_DIR, "*.txt"))
-    total_files = len(wiki_files)
-    print(f"Found {total_files} wiki files")
+    wiki_files = [e for e in os.scandir(PARSED_WIKI_DIR) if e.name.endswith(".txt")]
+    print(f"Found {len(wiki_files)} wiki files")
     
-    for i, file_path in enumerate(wiki_files):
-        if i % 100 == 0:
-            print(f"Processing wiki file {i+1}/{total_files}")
-            
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-                # Split content into metadata and text
-                parts = content.split("---\n", 2)
-                
-                if len(parts) >= 3:
-                    metadata_str = parts[1].strip()
-                    text_content = parts[2].strip()
-                    
-                    # Parse metadata
-                    try:
-                        metadata = json.loads(metadata_str)
-                    except json.JSONDecodeError:
-                        metadata = {"title": os.path.basename(file_path), "categories": []}
-                    
-                    # Create dataset entry
-                    entry = {
-                        "id": os.path.basename(file_path).replace(".txt", ""),
-                        "title": metadata.get("title", ""),
-                        "categories": metadata.get("categories", []),
-                        "content": text_content,
-                        "source": "wiki",
-                        "url": f"https://wiki.factorio.com/{metadata.get('title', '').replace(' ', '_')}"
-                    }
-                    
-                    wiki_data.append(entry)
-                else:
-                    # Handle files without proper metadata separators
-                    entry = {
-                        "id": os.path.basename(file_path).replace(".txt", ""),
-                        "title": os.path.basename(file_path).replace(".txt", "").replace("_", " "),
-                        "categories": [],
-                        "content": content,
-                        "source": "wiki",
-                        "url": ""
-                    }
-                    wiki_data.append(entry)
-                
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
+    yield from _iter_entries(_process_wiki_file, wiki_files, "wiki")
+
+def _format_post(post):
+    """Format a forum post with its author, date and any quotes"""
+    author = post.get("author", "")
+    date = post.get("date", "")
+    post_content = post.get("content", "")
     
-    return wiki_data
+    # Format post with author and date
+    post_text = f"Author: {author}\nDate: {date}\n\n{post_content}"
+    
+    # Add quotes if any
+    quotes = post.get("quotes", [])
+    if quotes:
+        quote_texts = [
+            f"Quote from {quote.get('author', '')}:\n{quote.get('content', '')}"
+            for quote in quotes
+        ]
+        post_text += "\n\nQuotes:\n" + "\n\n".join(quote_texts)
+    
+    return post_text
+
+def _process_forum_file(entry):
+    """Load a single cleaned forum file (an os.DirEntry) and turn it into a dataset entry"""
+    try:
+        forum_json = _json_loads(_read_file(entry))
+            
+        # Extract topic info
+        topic_info = forum_json.get("topic_info", {})
+        posts = forum_json.get("posts", [])
+        
+        # Combine all posts
+        combined_content = "\n\n---\n\n".join([_format_post(post) for post in posts])
+        
+        # Create dataset entry
+        return {
+            "id": entry.name[:-len(".json")],
+            "title": topic_info.get("title", ""),
+            "categories": [_memo(topic_info.get("section", ""))],
+            "content": combined_content,
+            "source": "forum",
+            "url": topic_info.get("url", "")
+        }
+        
+    except Exception as e:
+        print(f"Error processing {entry.path}: {e}")
+        return None
 
-def load_forum_files():
-    """Load and process cleaned forum files"""
+def iter_forum_entries():
+    """Yield dataset entries for the cleaned forum files"""
     print("Loading forum files...")
-    forum_data = []
     
     # Get all forum JSON files
-    forum_files = glob.glob(os.path.join(CLEANED_FORUM_DIR, "*.json"))
-    total_files = len(forum_files)
-    print(f"Found {total_files} forum files")
+    forum_files = [e for e in os.scandir(CLEANED_FORUM_DIR) if e.name.endswith(".json")]
+    print(f"Found {len(forum_files)} forum files")
     
-    for i, file_path in enumerate(forum_files):
-        if i % 50 == 0:
-            print(f"Processing forum file {i+1}/{total_files}")
-            
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                forum_json = json.load(f)
-                
-                # Extract topic info
-                topic_info = forum_json.get("topic_info", {})
-                posts = forum_json.get("posts", [])
-                
-                # Create content from posts
-                content_parts = []
-                
-                for post in posts:
-                    author = post.get("author", "")
-                    date = post.get("date", "")
-                    post_content = post.get("content", "")
-                    
-                    # Format post with author and date
-                    post_text = f"Author: {author}\nDate: {date}\n\n{post_content}"
-                    
-                    # Add quotes if any
-                    quotes = post.get("quotes", [])
-                    if quotes:
-                        quote_texts = []
-                        for quote in quotes:
-                            quote_author = quote.get("author", "")
-                            quote_content = quote.get("content", "")
-                            quote_texts.append(f"Quote from {quote_author}:\n{quote_content}")
-                        
-                        post_text += "\n\nQuotes:\n" + "\n\n".join(quote_texts)
-                    
-                    content_parts.append(post_text)
-                
-                # Combine all posts
-                combined_content = "\n\n---\n\n".join(content_parts)
-                
-                # Create dataset entry
-                entry = {
-                    "id": os.path.basename(file_path).replace(".json", ""),
-                    "title": topic_info.get("title", ""),
-                    "categories": [topic_info.get("section", "")],
-                    "content": combined_content,
-                    "source": "forum",
-                    "url": topic_info.get("url", "")
-                }
-                
-                forum_data.append(entry)
-                
-        except Exception as e:
-            print(f"Error processing {file_path}: {e}")
-    
-    return forum_data
+    yield from _iter_entries(_process_forum_file, forum_files, "forum")
+
+def generate_entries():
+    """Yield all wiki entries followed by all forum entries"""
+    yield from iter_wiki_entries()
+    yield from iter_forum_entries()
 
 def create_huggingface_dataset():
     """Create Hugging Face dataset from wiki and forum data"""
     # Create output directory if it doesn't exist
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
-    # Load data
-    wiki_data = load_wiki_files()
-    forum_data = load_forum_files()
-    
-    # Create combined dataset
-    all_data = wiki_data + forum_data
-    print(f"Total entries: {len(all_data)} (Wiki: {len(wiki_data)}, Forum: {len(forum_data)})")
-    
-    # Convert to pandas DataFrame first (easier to handle)
-    df = pd.DataFrame(all_data)
-    
-    # No train/test split, keeping all data in a single set
-    # This is more appropriate for a knowledge dataset
-    
-    # Convert to Hugging Face Dataset
-    full_dataset = Dataset.from_pandas(df)
-    
-    # Create dataset dictionary with a single split
-    dataset_dict = DatasetDict({
-        'data': full_dataset
-    })
-    
-    # Save locally
-    local_path = os.path.join(OUTPUT_DIR, DATASET_NAME)
-    dataset_dict.save_to_disk(local_path)
-    print(f"Dataset saved locally to {local_path}")
+    # The generator streams entries into Arrow files in a scratch cache dir, so
+    # peak memory does not grow with the corpus. The dir is made inside
+    # OUTPUT_DIR, on the same disk as the saved dataset, since the system temp
+    # dir may be a tmpfs held in RAM. A fresh dir per run also stops datasets
+    # from reusing a cached build after the input files change.
+    with tempfile.TemporaryDirectory(dir=OUTPUT_DIR) as cache_dir:
+        # No train/test split, keeping all data in a single set
+        # This is more appropriate for a knowledge dataset
+        full_dataset = Dataset.from_generator(
+            generate_entries,
+            features=KNOWLEDGE_FEATURES,
+            cache_dir=cache_dir
+        )
+        
+        # Count entries per source for the summary and README
+        source_counts = Counter(full_dataset["source"])
+        wiki_count = source_counts["wiki"]
+        forum_count = source_counts["forum"]
+        total_entries = len(full_dataset)
+        print(f"Total entries: {total_entries} (Wiki: {wiki_count}, Forum: {forum_count})")
+        
+        # Create dataset dictionary with a single split
+        dataset_dict = DatasetDict({
+            'data': full_dataset
+        })
+        
+        # Save locally, writing shards in parallel
+        local_path = os.path.join(OUTPUT_DIR, DATASET_NAME)
+        num_shards = max(1, min(NUM_SHARDS, len(full_dataset)))
+        dataset_dict.save_to_disk(
+            local_path,
+            num_shards={'data': num_shards},
+            num_proc=min(SAVE_NUM_PROC, num_shards)
+        )
+        print(f"Dataset saved locally to {local_path}")
     
     # Create README content
     readme_content = f"""# Factorio Knowledge Dataset
@@ -176,9 +248,9 @@ This dataset contains information from the Factorio Wiki and Factorio Forums, pr
 
 ## Dataset Structure
 
-The dataset contains {len(all_data)} entries in total:
-- {len(wiki_data)} wiki articles
-- {len(forum_data)} forum posts
+The dataset contains {total_entries} entries in total:
+- {wiki_count} wiki articles
+- {forum_count} forum posts
 
 All entries are contained in a single 'data' split, making it easy to use for knowledge retrieval and reference purposes.
 
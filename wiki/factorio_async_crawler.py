@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+import os
+import csv
+import asyncio
+import argparse
+from urllib.parse import urljoin, urldefrag, urlparse
+
+import aiohttp
+import aiofiles
+from selectolax.lexbor import LexborHTMLParser
+
+from factorio_scraper import FactorioSpider
+from factorio_forum_scraper import FactorioForumSpider
+
+# Lightweight fetch-and-save crawler for the wiki and the forums. It produces
+# the same files as the Scrapy spiders (same output directories and filenames)
+# without Scrapy's middleware, scheduler and item pipeline, which these
+# save-only crawls do not use.
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+CONCURRENCY = 64   # Number of worker tasks / open connections
+DEPTH_LIMIT = 5    # Same crawl depth as the Scrapy spiders
+DELAY = 0.1        # Minimum delay between starting two requests, in seconds
+
+SITES = {
+    "wiki": {
+        "spider": FactorioSpider,
+        "title_selector": "h1#firstHeading",
+        "csv": "factorio_wiki_pages.csv",
+    },
+    "forum": {
+        "spider": FactorioForumSpider,
+        "title_selector": "title",
+        "csv": "factorio_forum_pages.csv",
+    },
+}
+
+def should_skip(site, link):
+    """Return True if a link from a page of this site should not be followed"""
+    if site == "wiki":
+        return (not link or link.startswith('javascript:') or link.startswith('#')
+                or FactorioSpider.should_filter_link(link))
+    return FactorioForumSpider.should_skip_link(link)
+
+class Crawler:
+    """Breadth-first crawl of one site with a shared URL frontier and N workers"""
+
+    def __init__(self, site, concurrency=CONCURRENCY, depth_limit=DEPTH_LIMIT, delay=DELAY):
+        self.site = site
+        self.config = SITES[site]
+        self.spider = self.config["spider"]
+        self.allowed_domains = set(self.spider.allowed_domains)
+        self.concurrency = concurrency
+        self.depth_limit = depth_limit
+        self.delay = delay
+
+        self.queue = asyncio.Queue()
+        self.seen = set()
+        self.pages = []
+
+        # Request pacing shared by all workers
+        self._rate_lock = asyncio.Lock()
+        self._next_request = 0.0
+
+    def enqueue(self, url, depth):
+        """Add a URL to the frontier unless it has been seen already"""
+        url = urldefrag(url)[0]
+        if url in self.seen:
+            return
+        self.seen.add(url)
+        self.queue.put_nowait((url, depth))
+
+    async def wait_for_slot(self):
+        """Space out request starts by at least self.delay seconds"""
+        if not self.delay:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._rate_lock:
+            now = loop.time()
+            if self._next_request > now:
+                await asyncio.sleep(self._next_request - now)
+                now = self._next_request
+            self._next_request = now + self.delay
+
+    async def fetch(self, session, url, depth):
+        """Download one page, save it and queue the links it contains"""
+        await self.wait_for_slot()
+        async with session.get(url) as response:
+            final_url = str(response.url)
+            if response.status != 200:
+                print(f"Skipping {url}: HTTP {response.status}")
+                return
+            if urlparse(final_url).hostname not in self.allowed_domains:
+                return
+            # Skip non-HTML responses (like image downloads)
+            if response.content_type != 'text/html':
+                print(f"Skipping non-HTML content: {final_url}")
+                return
+            body = await response.read()
+
+        # Wiki pages for other languages are neither saved nor followed
+        if self.site == "wiki" and FactorioSpider.should_filter_link(final_url):
+            return
+
+        filepath = os.path.join(self.spider.output_dir, self.spider.page_filename(final_url))
+        async with aiofiles.open(filepath, 'wb') as f:
+            await f.write(body)
+
+        tree = LexborHTMLParser(body)
+        title_node = tree.css_first(self.config["title_selector"])
+        self.pages.append({
+            'url': final_url,
+            'title': title_node.text() if title_node else None,
+        })
+
+        if depth >= self.depth_limit:
+            return
+
+        for node in tree.css('a[href]'):
+            link = node.attributes.get('href') or ''
+            if should_skip(self.site, link):
+                continue
+
+            absolute = urljoin(final_url, link)
+            parsed = urlparse(absolute)
+            if parsed.scheme in ('http', 'https') and parsed.hostname in self.allowed_domains:
+                self.enqueue(absolute, depth + 1)
+
+    async def worker(self, session):
+        """Process URLs from the frontier until cancelled"""
+        while True:
+            url, depth = await self.queue.get()
+            try:
+                await self.fetch(session, url, depth)
+            except Exception as e:
+                print(f"Error processing {url}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def run(self):
+        """Crawl from the spider's start URLs until the frontier is empty"""
+        os.makedirs(self.spider.output_dir, exist_ok=True)
+        for url in self.spider.start_urls:
+            self.enqueue(url, 0)
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        async with aiohttp.ClientSession(connector=connector, headers={'User-Agent': USER_AGENT}) as session:
+            workers = [asyncio.create_task(self.worker(session)) for _ in range(self.concurrency)]
+            await self.queue.join()
+
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        # Write the same url/title report as the Scrapy feed export
+        with open(self.config["csv"], 'w', newline='', encoding='utf-8') as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=['url', 'title'])
+            writer.writeheader()
+            writer.writerows(self.pages)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch-and-save crawler for the Factorio wiki or forums")
+    parser.add_argument("site", choices=sorted(SITES), help="Which site to crawl")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Number of parallel requests")
+    parser.add_argument("--depth-limit", type=int, default=DEPTH_LIMIT, help="Maximum link depth to follow")
+    parser.add_argument("--delay", type=float, default=DELAY, help="Minimum seconds between request starts")
+    args = parser.parse_args()
+
+    crawler = Crawler(args.site, args.concurrency, args.depth_limit, args.delay)
+
+    print(f"Starting Factorio {args.site} crawler...")
+    print(f"Pages will be saved to the '{crawler.spider.output_dir}' directory")
+    print(f"URLs will be saved to '{crawler.config['csv']}'")
+
+    asyncio.run(crawler.run())
+
+    print(f"Crawling complete! Saved {len(crawler.pages)} pages.")
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ import scrapy
 from scrapy.crawler import CrawlerProcess
 import re
 import os
+import queue
+import threading
 from urllib.parse import urlparse, parse_qs, unquote
 
 class FactorioForumSpider(scrapy.Spider):
@@ -19,8 +21,32 @@ class FactorioForumSpider(scrapy.Spider):
         # Create output directory if it doesn't exist
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
+        
+        # Pages are written by a background thread to keep disk I/O off the reactor
+        self._writer_queue = queue.Queue(maxsize=256)
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
+    
+    def _writer_loop(self):
+        """Write queued (filepath, body) pairs until the None sentinel arrives"""
+        while True:
+            item = self._writer_queue.get()
+            if item is None:
+                break
+            
+            filepath, body = item
+            try:
+                with open(filepath, 'wb') as f:
+                    f.write(body)
+            except OSError as e:
+                self.logger.error(f"Error saving {filepath}: {e}")
     
-    def parse(self, response):
+    def closed(self, reason):
+        """Flush pending page writes when the spider closes"""
+        self._writer_queue.put(None)
+        self._writer_thread.join()
+    
+    async def parse(self, response):
         """Main parsing method for forum pages"""
         # Skip non-HTML responses (like image downloads)
         if not isinstance(response, scrapy.http.TextResponse):
@@ -55,7 +81,8 @@ class FactorioForumSpider(scrapy.Spider):
         except Exception as e:
             self.logger.error(f"Error processing {response.url}: {e}")
     
-    def should_skip_link(self, link):
+    @staticmethod
+    def should_skip_link(link):
         """Return True if link should be skipped"""
         # Skip empty, javascript and fragment links
         if not link or link.startswith('javascript:') or link.startswith('#'):
@@ -73,8 +100,15 @@ class FactorioForumSpider(scrapy.Spider):
     
     def save_page(self, response):
         """Save the page content to a file"""
+        # Queue the HTML content for the writer thread
+        filepath = os.path.join(self.output_dir, self.page_filename(response.url))
+        self._writer_queue.put((filepath, response.body))
+    
+    @staticmethod
+    def page_filename(url):
+        """Return the filename a page URL is saved under"""
         # Parse the URL to create a filename
-        parsed_url = urlparse(response.url)
+        parsed_url = urlparse(url)
         path = parsed_url.path
         
         # Create a reasonable filename
@@ -94,12 +128,7 @@ class FactorioForumSpider(scrapy.Spider):
         filename = filename[:100]  # Limit filename length
         
         # Prepend underscore and add extension
-        filename = f"_{filename}.html"
-        
-        # Save the HTML content
-        filepath = os.path.join(self.output_dir, filename)
-        with open(filepath, 'wb') as f:
-            f.write(response.body)
+        return f"_{filename}.html"
 
 # Run the spider
 if __name__ == "__main__":
@@ -113,6 +142,8 @@ if __name__ == "__main__":
         'CONCURRENT_REQUESTS_PER_DOMAIN': 32,
         'DEPTH_LIMIT': 5,         # Limit crawl depth
         'LOG_LEVEL': 'INFO',
+        # asyncio reactor, so the async parse callbacks run on an asyncio event loop
+        'TWISTED_REACTOR': 'twisted.internet.asyncioreactor.AsyncioSelectorReactor',
         # Performance optimizations
         'HTTPCACHE_ENABLED': True,
         'HTTPCACHE_EXPIRATION_SECS': 86400,
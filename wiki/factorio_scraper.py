@@ -2,6 +2,8 @@ import scrapy
 from scrapy.crawler import CrawlerProcess
 import re
 import os
+import queue
+import threading
 from urllib.parse import urlparse, parse_qs, unquote
 
 class FactorioSpider(scrapy.Spider):
@@ -18,6 +20,16 @@ class FactorioSpider(scrapy.Spider):
         'zh', 'zh-tw'
     ]
     
+    # Language codes as a set for whole-segment checks, plus single
+    # alternation regexes for the substring cases
+    _lang_set = frozenset(languages_to_filter)
+    _lang_alternation = '|'.join(map(re.escape, languages_to_filter))
+    _lang_prefix_re = re.compile(r'/(?:' + _lang_alternation + r')')
+    _lang_paren_re = re.compile(r'\([^)]+\)/(?:' + _lang_alternation + r')')
+    
+    # Characters that are not allowed in filenames
+    _unsafe_filename_re = re.compile(r'[\\/*?:"<>|]')
+    
     # Directory to save HTML files
     output_dir = "scraped_html_files"
     
@@ -26,8 +38,32 @@ class FactorioSpider(scrapy.Spider):
         # Create output directory if it doesn't exist
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
+        
+        # Pages are written by a background thread to keep disk I/O off the reactor
+        self._writer_queue = queue.Queue(maxsize=256)
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer_thread.start()
     
-    def parse(self, response):
+    def _writer_loop(self):
+        """Write queued (filepath, body) pairs until the None sentinel arrives"""
+        while True:
+            item = self._writer_queue.get()
+            if item is None:
+                break
+            
+            filepath, body = item
+            try:
+                with open(filepath, 'wb') as f:
+                    f.write(body)
+            except OSError as e:
+                self.logger.error(f"Error saving {filepath}: {e}")
+    
+    def closed(self, reason):
+        """Flush pending page writes when the spider closes"""
+        self._writer_queue.put(None)
+        self._writer_thread.join()
+    
+    async def parse(self, response):
         """Main parsing method"""
         # Extract page data
         title = response.css('h1#firstHeading::text').get()
@@ -58,8 +94,15 @@ class FactorioSpider(scrapy.Spider):
     
     def save_page(self, response):
         """Save the page content to a file"""
+        # Queue the complete HTML content for the writer thread
+        filepath = os.path.join(self.output_dir, self.page_filename(response.url))
+        self._writer_queue.put((filepath, response.body))
+    
+    @classmethod
+    def page_filename(cls, url):
+        """Return the filename a page URL is saved under"""
         # Parse the URL to get the path
-        parsed_url = urlparse(response.url)
+        parsed_url = urlparse(url)
         path = parsed_url.path
         
         # Clean up the path to create a valid filename
@@ -75,17 +118,13 @@ class FactorioSpider(scrapy.Spider):
             filename = f"{filename}_{query_part}"
         
         # Replace problematic characters
-        filename = re.sub(r'[\\/*?:"<>|]', '_', filename)
+        filename = cls._unsafe_filename_re.sub('_', filename)
         
         # Prepend underscore to avoid issues with filenames starting with special characters
-        filename = f"_{filename}.html"
-        
-        # Save the complete HTML content
-        filepath = os.path.join(self.output_dir, filename)
-        with open(filepath, 'wb') as f:
-            f.write(response.body)
+        return f"_{filename}.html"
     
-    def should_filter_link(self, link):
+    @classmethod
+    def should_filter_link(cls, link):
         """
         Returns True if the link should be filtered out (contains language code),
         False otherwise.
@@ -101,35 +140,33 @@ class FactorioSpider(scrapy.Spider):
         # Handle different URL patterns
         
         # Pattern 1: Direct language suffix: /PageName/lang
-        for lang in self.languages_to_filter:
-            if re.search(r'/[^/]+/' + re.escape(lang) + '$', path):
-                return True
+        segments = path.rsplit('/', 2)
+        if len(segments) == 3 and segments[1] and segments[2] in cls._lang_set:
+            return True
         
         # Pattern 2: Special pages with language codes in path/query
         if 'title' in query:
             title_value = query['title'][0]
             # Check for language code at the end of title parameter
-            for lang in self.languages_to_filter:
-                if title_value.endswith('/' + lang):
-                    return True
-                # Handle Special:WhatLinksHere/PageName/lang
-                if 'WhatLinksHere' in title_value and '/' + lang in title_value:
-                    return True
-                # Handle Special:RecentChangesLinked/PageName/lang
-                if 'RecentChangesLinked' in title_value and '/' + lang in title_value:
-                    return True
+            if '/' in title_value and title_value.rsplit('/', 1)[1] in cls._lang_set:
+                return True
+            # Handle Special:WhatLinksHere/PageName/lang and
+            # Special:RecentChangesLinked/PageName/lang
+            if ('WhatLinksHere' in title_value or 'RecentChangesLinked' in title_value) \
+                    and cls._lang_prefix_re.search(title_value):
+                return True
         
         # Pattern 3: Check for other special pages with language codes
-        for lang in self.languages_to_filter:
-            # Look for language code patterns in various URL formats
-            lang_pattern = r'/' + re.escape(lang) + r'(&|$|/)'
-            if re.search(lang_pattern, decoded_link):
-                return True
-            
-            # Check for parenthesized content with language code
-            if re.search(r'\([^)]+\)/' + re.escape(lang), decoded_link):
+        # Look for a path segment (optionally followed by &) that is a language code;
+        # a single trailing newline is ignored, as the old '$'-anchored regex did
+        for segment in decoded_link.removesuffix('\n').split('/')[1:]:
+            if segment.partition('&')[0] in cls._lang_set:
                 return True
         
+        # Check for parenthesized content with language code
+        if cls._lang_paren_re.search(decoded_link):
+            return True
+        
         # Not filtered
         return False
 
@@ -145,6 +182,8 @@ if __name__ == "__main__":
         'CONCURRENT_REQUESTS_PER_DOMAIN': 32,
         'DEPTH_LIMIT': 5,
         'LOG_LEVEL': 'INFO',
+        # asyncio reactor, so the async parse callbacks run on an asyncio event loop
+        'TWISTED_REACTOR': 'twisted.internet.asyncioreactor.AsyncioSelectorReactor',
         # Cache settings
         'HTTPCACHE_ENABLED': True,
         'HTTPCACHE_EXPIRATION_SECS': 86400,
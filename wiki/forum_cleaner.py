@@ -3,20 +3,38 @@ import os
 import re
 import json
 import datetime
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from selectolax.lexbor import LexborHTMLParser
 import html
 import csv
+from concurrent.futures import ProcessPoolExecutor
 
 # Configuration
 FORUM_PAGES_DIR = "/mnt/sai/factorio_forum"
 OUTPUT_DIR = "/home/sai/Desktop/factorio/pratincole/wiki/cleaned_forum_all"
 CSV_OUTPUT = "/home/sai/Desktop/factorio/pratincole/wiki/forum_topics_all.csv"
+SKIP_EXISTING = True  # Reuse JSON files from an earlier run instead of cleaning those pages again
+
+# Patterns used for every file, compiled once
+_TOPIC_FILE_RE = re.compile(r'_viewtopic\.php_t_(\d+)')
+_POST_FILE_RE = re.compile(r'_viewtopic\.php_p_(\d+)')
+_UNSAFE_CHARS_RE = re.compile(r'[^\w\-\.]')
+_TOPIC_ID_RE = re.compile(r't=(\d+)')
+_POST_ID_RE = re.compile(r'p=(\d+)')
+_USER_ID_RE = re.compile(r'u=(\d+)')
+_POST_DIV_ID_RE = re.compile(r'p(\d+)')
+
+# Only the post divs are built into a BeautifulSoup tree; the rest of the
+# page (navigation, header, footer) is skipped while parsing. The strainer
+# sees the raw class attribute ("post bg2"), so match "post" as a word in it.
+_POST_CLASS_RE = re.compile(r'(?:^|\s)post(?:\s|$)')
+_POST_STRAINER = SoupStrainer('div', class_=_POST_CLASS_RE)
 
 def clean_filename(filename):
     """Create a clean filename from the original forum page filename"""
     # Extract topic ID or post ID from filename
-    topic_match = re.search(r'_viewtopic\.php_t_(\d+)', filename)
-    post_match = re.search(r'_viewtopic\.php_p_(\d+)', filename)
+    topic_match = _TOPIC_FILE_RE.search(filename)
+    post_match = _POST_FILE_RE.search(filename)
     
     if topic_match:
         return f"topic_{topic_match.group(1)}.json"
@@ -24,11 +42,11 @@ def clean_filename(filename):
         return f"post_{post_match.group(1)}.json"
     else:
         # Fallback - just remove special characters
-        clean = re.sub(r'[^\w\-\.]', '_', filename)
+        clean = _UNSAFE_CHARS_RE.sub('_', filename)
         return f"forum_{clean}.json"
 
-def extract_topic_info(soup):
-    """Extract basic topic information from the page"""
+def extract_topic_info(tree):
+    """Extract basic topic information from the page (a LexborHTMLParser tree)"""
     info = {
         "title": "",
         "topic_id": None,
@@ -42,19 +60,19 @@ def extract_topic_info(soup):
     }
     
     # Extract title
-    title_tag = soup.find('title')
+    title_tag = tree.css_first('title')
     if title_tag:
-        info["title"] = title_tag.get_text().replace(" - Factorio Forums", "").strip()
+        info["title"] = title_tag.text().replace(" - Factorio Forums", "").strip()
     
     # Extract topic/post IDs from meta tags
-    og_url = soup.find('meta', property='og:url')
+    og_url = tree.css_first('meta[property="og:url"]')
     if og_url:
-        url = og_url.get('content', '')
+        url = og_url.attributes.get('content') or ''
         info["url"] = url
         
         # Try to extract topic or post ID
-        topic_match = re.search(r't=(\d+)', url)
-        post_match = re.search(r'p=(\d+)', url)
+        topic_match = _TOPIC_ID_RE.search(url)
+        post_match = _POST_ID_RE.search(url)
         
         if topic_match:
             info["topic_id"] = int(topic_match.group(1))
@@ -62,23 +80,23 @@ def extract_topic_info(soup):
             info["post_id"] = int(post_match.group(1))
     
     # Extract section
-    section_meta = soup.find('meta', property='article:section')
+    section_meta = tree.css_first('meta[property="article:section"]')
     if section_meta:
-        info["section"] = section_meta.get('content', '')
+        info["section"] = section_meta.attributes.get('content') or ''
     
     # Extract author and timestamp
-    author_meta = soup.find('meta', property='article:author')
+    author_meta = tree.css_first('meta[property="article:author"]')
     if author_meta:
-        info["author"] = author_meta.get('content', '')
+        info["author"] = author_meta.attributes.get('content') or ''
         
-    time_meta = soup.find('meta', property='article:published_time')
+    time_meta = tree.css_first('meta[property="article:published_time"]')
     if time_meta:
-        info["timestamp"] = time_meta.get('content', '')
+        info["timestamp"] = time_meta.attributes.get('content') or ''
         
     # Try to extract author ID if it exists
-    author_link = soup.find('a', href=lambda href: href and 'memberlist.php?mode=viewprofile&u=' in href)
+    author_link = tree.css_first('a[href*="memberlist.php?mode=viewprofile&u="]')
     if author_link:
-        author_id_match = re.search(r'u=(\d+)', author_link.get('href', ''))
+        author_id_match = _USER_ID_RE.search(author_link.attributes.get('href') or '')
         if author_id_match:
             info["author_id"] = int(author_id_match.group(1))
             
@@ -103,7 +121,7 @@ def extract_posts(soup):
         
         # Get post ID
         post_id_attr = post_div.get('id', '')
-        post_id_match = re.search(r'p(\d+)', post_id_attr)
+        post_id_match = _POST_DIV_ID_RE.search(post_id_attr)
         if post_id_match:
             post["post_id"] = int(post_id_match.group(1))
         
@@ -114,7 +132,7 @@ def extract_posts(soup):
             
             # Try to extract author ID
             author_link = author_elem.get('href', '')
-            author_id_match = re.search(r'u=(\d+)', author_link)
+            author_id_match = _USER_ID_RE.search(author_link)
             if author_id_match:
                 post["author_id"] = int(author_id_match.group(1))
         
@@ -126,9 +144,11 @@ def extract_posts(soup):
         # Get content
         content_div = post_div.find('div', class_='content')
         if content_div:
-            # Extract quotes
+            # Extract quotes. All blockquotes, nested ones included, are read
+            # before any of them is removed from the tree.
             quotes = []
-            for quote_div in content_div.find_all('blockquote'):
+            quote_divs = content_div.find_all('blockquote')
+            for quote_div in quote_divs:
                 quote = {
                     "author": "",
                     "content": ""
@@ -143,9 +163,11 @@ def extract_posts(soup):
                     quote["content"] = quote_content.get_text().strip()
                 
                 quotes.append(quote)
-                
-                # Remove the blockquote to avoid duplicating content
-                quote_div.extract()
+            
+            # Remove the blockquotes to avoid duplicating content, innermost
+            # first so each one is still attached when it is destroyed
+            for quote_div in reversed(quote_divs):
+                quote_div.decompose()
             
             post["quotes"] = quotes
             
@@ -156,80 +178,138 @@ def extract_posts(soup):
     
     return posts
 
+def index_row(output_filename, topic_info, post_count):
+    """Build the topic index (CSV) row for one cleaned page"""
+    return {
+        "filename": output_filename,
+        "title": topic_info["title"],
+        "topic_id": topic_info["topic_id"],
+        "post_id": topic_info["post_id"],
+        "url": topic_info["url"],
+        "section": topic_info["section"],
+        "author": topic_info["author"],
+        "timestamp": topic_info["timestamp"],
+        "post_count": post_count
+    }
+
+def process_one(filename):
+    """Clean a single forum page file and return its row for the topic index"""
+    filepath = os.path.join(FORUM_PAGES_DIR, filename)
+    
+    # Generate output filename
+    output_filename = clean_filename(filename)
+    output_path = os.path.join(OUTPUT_DIR, output_filename)
+    
+    try:
+        # Read the raw bytes and let both parsers decode them as UTF-8
+        # themselves, instead of decoding to a str first
+        with open(filepath, 'rb') as file:
+            html_content = file.read()
+        
+        # Topic info only needs the title, a few meta tags and one link, which
+        # the lexbor parser finds much faster than a full BeautifulSoup tree.
+        # The posts are parsed with BeautifulSoup, building only the post divs.
+        topic_info = extract_topic_info(LexborHTMLParser(html_content))
+        soup = BeautifulSoup(html_content, 'lxml', from_encoding='utf-8', parse_only=_POST_STRAINER)
+        posts = extract_posts(soup)
+        
+        # Create output data structure
+        output_data = {
+            "topic_info": topic_info,
+            "posts": posts
+        }
+        
+        # Save to JSON file, serialising to a string first so the whole
+        # document goes out in a single write instead of one per token.
+        # It is written under a temporary name and renamed into place, so
+        # readers only ever see a complete file.
+        tmp_path = f"{output_path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8', buffering=65536) as out_file:
+            out_file.write(json.dumps(output_data, ensure_ascii=False, indent=2))
+        os.replace(tmp_path, output_path)
+        
+        return index_row(output_filename, topic_info, len(posts))
+        
+    except Exception as e:
+        print(f"Error processing file {filename}: {e}")
+        return None
+
+def process_topic(filenames, done=False):
+    """Clean the pages that share one output file and return the file's index row"""
+    output_filename = clean_filename(filenames[0])
+    output_path = os.path.join(OUTPUT_DIR, output_filename)
+    
+    # Topics cleaned by an earlier run only need their index row, which is
+    # read back from the JSON file. A file left incomplete by an interrupted
+    # run fails to load and the topic is cleaned again.
+    if done:
+        try:
+            with open(output_path, 'rb') as in_file:
+                existing_data = json.loads(in_file.read())
+            return index_row(output_filename, existing_data["topic_info"], len(existing_data["posts"]))
+        except (OSError, ValueError, KeyError):
+            pass
+    
+    # The output file holds the last page in the listing that cleans
+    # successfully, so try the pages from the end and stop at the first
+    # one that works. Its row is the index row for the file, the same row
+    # a later run reads back above.
+    for filename in reversed(filenames):
+        topic = process_one(filename)
+        if topic is not None:
+            return topic
+    return None
+
 def process_forum_pages():
     """Process all forum page files in the source directory"""
     # Create output directory if it doesn't exist
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
     
-    # List of all processed topic data
-    all_topics = []
-    
     # Get viewtopic files
     viewtopic_files = [f for f in os.listdir(FORUM_PAGES_DIR) if "_viewtopic" in f]
     total_files = len(viewtopic_files)
     
     print(f"Found {total_files} forum topic pages to process")
     
-    # Process each file
-    for i, filename in enumerate(viewtopic_files):
-        if i % 10 == 0:
-            print(f"Processing file {i+1}/{total_files}: {filename}")
-        
-        filepath = os.path.join(FORUM_PAGES_DIR, filename)
-        
-        try:
-            with open(filepath, 'r', encoding='utf-8', errors='replace') as file:
-                html_content = file.read()
-            
-            # Parse HTML
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Extract topic info and posts
-            topic_info = extract_topic_info(soup)
-            posts = extract_posts(soup)
-            
-            # Create output data structure
-            output_data = {
-                "topic_info": topic_info,
-                "posts": posts
-            }
-            
-            # Generate output filename
-            output_filename = clean_filename(filename)
-            output_path = os.path.join(OUTPUT_DIR, output_filename)
-            
-            # Save to JSON file
-            with open(output_path, 'w', encoding='utf-8') as out_file:
-                json.dump(output_data, out_file, ensure_ascii=False, indent=2)
-            
-            # Add to all topics list
-            all_topics.append({
-                "filename": output_filename,
-                "title": topic_info["title"],
-                "topic_id": topic_info["topic_id"],
-                "post_id": topic_info["post_id"],
-                "url": topic_info["url"],
-                "section": topic_info["section"],
-                "author": topic_info["author"],
-                "timestamp": topic_info["timestamp"],
-                "post_count": len(posts)
-            })
-            
-        except Exception as e:
-            print(f"Error processing file {filename}: {e}")
+    # All pages of a topic (t_123, t_123_start_20, ...) map to one output
+    # file. Group them in listing order so each file is written by a single
+    # worker, and the same page wins on every run.
+    pages_by_output = {}
+    for filename in viewtopic_files:
+        pages_by_output.setdefault(clean_filename(filename), []).append(filename)
+    total_topics = len(pages_by_output)
+    
+    # List the output directory once and flag the topics already cleaned
+    existing = set(os.listdir(OUTPUT_DIR)) if SKIP_EXISTING else set()
+    done_flags = [output_filename in existing for output_filename in pages_by_output]
+    if existing:
+        print(f"Skipping {sum(done_flags)} topics already cleaned")
     
-    # Write topics to CSV
-    with open(CSV_OUTPUT, 'w', newline='', encoding='utf-8') as csv_file:
+    # Number of topics written to the CSV
+    topic_count = 0
+    
+    # Write each topic to the CSV as soon as it is cleaned, so memory use stays
+    # flat and a partial index survives an interrupted run
+    with open(CSV_OUTPUT, 'w', newline='', encoding='utf-8', buffering=1 << 16) as csv_file:
         fieldnames = ['filename', 'title', 'topic_id', 'post_id', 'url', 'section', 
                      'author', 'timestamp', 'post_count']
         writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-        
         writer.writeheader()
-        for topic in all_topics:
-            writer.writerow(topic)
+        
+        # Topics are independent and parsing is CPU-bound, so clean them in a
+        # process pool; map keeps the results in topic order
+        with ProcessPoolExecutor() as executor:
+            results = executor.map(process_topic, pages_by_output.values(), done_flags, chunksize=32)
+            for i, (output_filename, topic) in enumerate(zip(pages_by_output, results)):
+                if i % 10 == 0:
+                    print(f"Processed topic {i+1}/{total_topics}: {output_filename}")
+                
+                if topic is not None:
+                    writer.writerow(topic)
+                    topic_count += 1
     
-    print(f"Processed {len(all_topics)} forum topics")
+    print(f"Processed {topic_count} forum topics")
     print(f"Results saved to {OUTPUT_DIR}")
     print(f"Topic index saved to {CSV_OUTPUT}")
 
@@ -3,24 +3,56 @@ import os
 import shutil
 import time
 import datetime
+import functools
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
 
 # Source and destination directories
 SRC_DIR = "/home/sai/Desktop/factorio/pratincole/wiki/forum_pages"
 DEST_DIR = "/mnt/sai/factorio_forum"
+SYNC_INTERVAL = 60  # Seconds between safety passes over the whole source directory
+SETTLE_TIME = 5  # Files unmodified for this many seconds are not being written
 
-def sync_files():
+@functools.cache
+def same_filesystem():
+    """Return True if SRC_DIR and DEST_DIR are on the same filesystem (checked once)"""
+    return os.stat(SRC_DIR).st_dev == os.stat(DEST_DIR).st_dev
+
+def move(src_path, dest_path):
+    """Move a file, as a single rename when both directories share a filesystem"""
+    if same_filesystem():
+        os.rename(src_path, dest_path)
+    else:
+        # Plain data copy, skipping copy2's metadata preservation
+        shutil.move(src_path, dest_path, copy_function=shutil.copyfile)
+
+def is_settled(mtime):
+    """Return True if a file last modified at mtime is no longer being written"""
+    return time.time() - mtime >= SETTLE_TIME
+
+def sync_files(settled_only=False):
     """Move files from source to destination directory, but only those matching _viewtopic pattern"""
     # Create destination directory if it doesn't exist
     if not os.path.exists(DEST_DIR):
         os.makedirs(DEST_DIR)
         print(f"Created destination directory: {DEST_DIR}")
     
-    # Get list of files in source directory
+    # Get the _viewtopic files in the source directory, skipping directories;
+    # scandir gets the file type from the directory listing without a stat
     try:
-        all_files = os.listdir(SRC_DIR)
-        
-        # Filter for only _viewtopic files
-        viewtopic_files = [f for f in all_files if "_viewtopic" in f]
+        viewtopic_files = []
+        for entry in os.scandir(SRC_DIR):
+            if "_viewtopic" not in entry.name or not entry.is_file(follow_symlinks=False):
+                continue
+            if settled_only:
+                # The event handler may move the file away at any moment
+                try:
+                    mtime = entry.stat(follow_symlinks=False).st_mtime
+                except FileNotFoundError:
+                    continue
+                if not is_settled(mtime):
+                    continue
+            viewtopic_files.append(entry.name)
         
         if not viewtopic_files:
             print(f"{datetime.datetime.now()}: No _viewtopic files to sync")
@@ -34,29 +66,86 @@ def sync_files():
             src_path = os.path.join(SRC_DIR, filename)
             dest_path = os.path.join(DEST_DIR, filename)
             
-            # Only move files, not directories
-            if os.path.isfile(src_path):
-                shutil.move(src_path, dest_path)
-                moved_count += 1
+            try:
+                move(src_path, dest_path)
+            except FileNotFoundError:
+                # Already moved by the event handler
+                continue
+            moved_count += 1
                 
         print(f"Moved {moved_count} _viewtopic files")
     
     except Exception as e:
         print(f"Error during sync: {e}")
 
+def move_file(src_path):
+    """Move a single file to the destination directory if it matches the _viewtopic pattern"""
+    filename = os.path.basename(src_path)
+    if "_viewtopic" not in filename:
+        return
+    
+    try:
+        move(src_path, os.path.join(DEST_DIR, filename))
+        print(f"{datetime.datetime.now()}: Moved {filename}")
+    except FileNotFoundError:
+        # Already moved (for example by the startup sync)
+        pass
+    except Exception as e:
+        print(f"Error moving {filename}: {e}")
+
+class ViewtopicHandler(FileSystemEventHandler):
+    """Move _viewtopic files out of the source directory as soon as they are complete"""
+    
+    def on_closed(self, event):
+        # Fired when a writer closes the file, so files are never moved half-written
+        if not event.is_directory:
+            move_file(event.src_path)
+    
+    def on_created(self, event):
+        # A file moved in from another directory arrives as a created event
+        # with no close event after it. It keeps its old mtime, which tells
+        # it apart from a file just opened for writing (left to on_closed).
+        if event.is_directory:
+            return
+        try:
+            mtime = os.stat(event.src_path).st_mtime
+        except FileNotFoundError:
+            return
+        if is_settled(mtime):
+            move_file(event.src_path)
+    
+    def on_moved(self, event):
+        # Files renamed within the source directory (like a temporary file
+        # given its final name) are already complete
+        if not event.is_directory and os.path.dirname(event.dest_path) == SRC_DIR:
+            move_file(event.dest_path)
+
 def main():
     print(f"Starting file sync from {SRC_DIR} to {DEST_DIR}")
     print("Press Ctrl+C to stop")
     
+    # Move anything that arrived while the sync was not running
+    sync_files()
+    
+    # Then move files as filesystem events arrive. A slow pass over the
+    # directory still runs every SYNC_INTERVAL seconds to pick up anything
+    # the events missed, skipping files that may still be being written.
+    observer = Observer()
+    observer.schedule(ViewtopicHandler(), SRC_DIR, recursive=False)
+    observer.start()
+    
     try:
-        while True:
-            sync_files()
-            time.sleep(60)  # Sleep for 60 seconds (1 minute)
+        while observer.is_alive():
+            observer.join(timeout=SYNC_INTERVAL)
+            sync_files(settled_only=True)
     
     except KeyboardInterrupt:
         print("\nSync stopped by user")
     except Exception as e:
         print(f"Unexpected error: {e}")
+    finally:
+        observer.stop()
+        observer.join()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,60 +3,86 @@ import os
 import zipfile
 import re
 import csv
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 import urllib.parse
+import functools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 # Configuration
 ZIP_FILE_PATH = "/home/sai/Desktop/factorio/pratincole/wiki/wiki_xml.zip"
 OUTPUT_CSV = "/home/sai/Desktop/factorio/pratincole/wiki/wiki_images.csv"
 OUTPUT_DIR = "/home/sai/Desktop/factorio/pratincole/wiki/image_data"
 BASE_URL = "https://wiki.factorio.com/images/"
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.gif', '.svg')
+BATCH_SIZE = 256  # Pages read from the archive per batch handed to the workers
 
+# Pixel size prefix of thumbnail names (like 32px-, 64px-, etc.)
+_PX_PREFIX_RE = re.compile(r'^\d+px-')
+
+# The same thumbnails and icons are referenced from many pages, so the
+# cleaned name is cached per distinct input
+@functools.lru_cache(maxsize=None)
 def clean_image_name(name):
     """Clean and normalize image name"""
     # Extract just the filename without path or extension
-    filename = os.path.basename(name)
+    filename = name.rpartition('/')[2]
     # Remove any URL encoding
     filename = urllib.parse.unquote(filename)
     # Strip extension if present
     if '.' in filename:
-        filename = filename[:filename.rindex('.')]
+        filename = filename.rpartition('.')[0]
     
     # Remove pixel size prefix (like 32px-, 64px-, etc.)
-    filename = re.sub(r'^\d+px-', '', filename)
+    filename = _PX_PREFIX_RE.sub('', filename)
     
     # Return clean name
     return filename
 
+def get_extension(path):
+    """Return the lowercased extension of path, as os.path.splitext would split it"""
+    # Leading dots of the last path component do not start an extension
+    base = path.rpartition('/')[2].lstrip('.')
+    _, dot, extension = base.rpartition('.')
+    return '.' + extension.lower() if dot else ''
+
 def find_images_in_html(html_content, source_file):
     """Extract image references from HTML content"""
     images = []
-    soup = BeautifulSoup(html_content, 'html.parser')
+    # Only img attributes are needed, so use the much lighter lexbor parser
+    tree = LexborHTMLParser(html_content)
     
-    # Keep track of processed image names to avoid duplicates
+    # Keep track of processed sources and image names to avoid duplicates
+    seen_srcs = set()
     processed_images = set()
     
     # Find all img tags
-    for img in soup.find_all('img'):
-        src = img.get('src', '')
-        alt = img.get('alt', '')
-        title = img.get('title', '')
+    for img in tree.css('img'):
+        attributes = img.attributes
+        src = attributes.get('src') or ''
+        alt = attributes.get('alt') or ''
+        title = attributes.get('title') or ''
         
         if src:
             # Clean up the source path
             src = src.strip()
             if src.startswith('/'):
                 src = src[1:]
+            
+            # A repeated src gives the same image name, so skip it before any more work
+            if src in seen_srcs:
+                continue
+            seen_srcs.add(src)
                 
-            # Extract image name and create URL
+            # Extract image name
             image_name = clean_image_name(src)
-            file_extension = os.path.splitext(src)[1].lower()
             
             # Skip if we've already processed this base image name
             if image_name in processed_images:
                 continue
                 
             processed_images.add(image_name)
+            file_extension = get_extension(src)
             
             # Create canonical URL
             url = BASE_URL + image_name + file_extension
@@ -74,21 +100,17 @@ def find_images_in_html(html_content, source_file):
     
     return images
 
-def extract_direct_image_files(zip_ref):
-    """Extract information about image files directly in the zip"""
+def extract_direct_image_files(image_files):
+    """Extract information about the image files stored directly in the zip"""
     images = []
-    # Filter for image files
-    image_extensions = ['.png', '.jpg', '.jpeg', '.gif', '.svg']
-    image_files = [f for f in zip_ref.namelist() 
-                  if any(f.lower().endswith(ext) for ext in image_extensions)]
     
     # Keep track of processed image names to avoid duplicates
     processed_images = set()
     
     for image_path in image_files:
-        filename = os.path.basename(image_path)
+        filename = image_path.rpartition('/')[2]
         image_name = clean_image_name(filename)
-        file_extension = os.path.splitext(filename)[1].lower()
+        file_extension = get_extension(filename)
         url = BASE_URL + image_name + file_extension
         
         # Skip if we've already processed this base image name
@@ -110,6 +132,39 @@ def extract_direct_image_files(zip_ref):
     
     return images
 
+def process_html_file(filename, raw_content):
+    """Find the images referenced by one HTML file from the archive"""
+    try:
+        # lexbor decodes the raw UTF-8 bytes itself
+        return find_images_in_html(raw_content, filename)
+    except Exception as e:
+        print(f"Error processing file {filename}: {e}")
+        return []
+
+def map_html_files(executor, process_file, zip_ref, file_list):
+    """Yield (filename, process_file(filename, content)) for each readable listed file, in order"""
+    # Members are read here (ZipFile isn't safe to share with workers) one
+    # batch at a time. The next batch is read while the workers parse the
+    # current one, so at most two batches of raw pages are held in memory.
+    pending = deque()
+    for start in range(0, len(file_list), BATCH_SIZE):
+        batch = []
+        contents = []
+        for filename in file_list[start:start + BATCH_SIZE]:
+            # A corrupt member (like a bad CRC) only skips that file
+            try:
+                contents.append(zip_ref.read(filename))
+            except Exception as e:
+                print(f"Error processing file {filename}: {e}")
+                continue
+            batch.append(filename)
+        pending.append(zip(batch, executor.map(process_file, batch, contents, chunksize=16)))
+        if len(pending) > 1:
+            yield from pending.popleft()
+    
+    while pending:
+        yield from pending.popleft()
+
 def process_wiki_files():
     """Process all files in the ZIP archive to find images"""
     # Create output directory if it doesn't exist
@@ -122,8 +177,17 @@ def process_wiki_files():
     
     # Extract and process files
     with zipfile.ZipFile(ZIP_FILE_PATH, 'r') as zip_ref:
+        # Sort the archive members into HTML pages and image files in one pass
+        html_files = []
+        image_files = []
+        for name in zip_ref.namelist():
+            if name.endswith('.html'):
+                html_files.append(name)
+            elif name.lower().endswith(IMAGE_EXTS):
+                image_files.append(name)
+        
         # First, get direct image files
-        direct_images = extract_direct_image_files(zip_ref)
+        direct_images = extract_direct_image_files(image_files)
         
         # Add these direct image names to our global tracking set
         for img in direct_images:
@@ -133,29 +197,21 @@ def process_wiki_files():
         print(f"Found {len(direct_images)} direct image files in the archive")
         
         # Then extract images referenced in HTML files
-        html_files = [f for f in zip_ref.namelist() if f.endswith('.html')]
-        
         print(f"Processing {len(html_files)} HTML files for image references")
         
-        for i, filename in enumerate(html_files):
-            if i % 100 == 0:
-                print(f"Processing file {i+1}/{len(html_files)}: {filename}")
-            
-            # Read file content
-            try:
-                with zip_ref.open(filename) as file:
-                    html_content = file.read().decode('utf-8', errors='replace')
-                
-                # Extract images from HTML
-                html_images = find_images_in_html(html_content, filename)
+        # The archive is read in this process and the HTML is parsed in a
+        # process pool; map keeps the results in file order
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            results = map_html_files(executor, process_html_file, zip_ref, html_files)
+            for i, (filename, html_images) in enumerate(results):
+                if i % 100 == 0:
+                    print(f"Processed file {i+1}/{len(html_files)}: {filename}")
                 
                 # Only add images we haven't seen yet (across both direct and HTML)
                 for img in html_images:
                     if img['image_name'] not in global_image_names:
                         global_image_names.add(img['image_name'])
                         all_images.append(img)
-            except Exception as e:
-                print(f"Error processing file {filename}: {e}")
     
     # Sort images by name for consistency
     all_images.sort(key=lambda x: x['image_name'])
@@ -183,17 +239,36 @@ def create_image_crawler(images):
     script_content = f"""#!/usr/bin/env python3
 import os
 import csv
-import requests
-import time
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+
+import aiohttp
+import aiofiles
 
 # Configuration
 CSV_FILE = "{OUTPUT_CSV}"
 OUTPUT_DIR = "{OUTPUT_DIR}/images"
 MAX_WORKERS = 5  # Number of parallel downloads
-DELAY = 0.5  # Delay between downloads in seconds
+DELAY = 0.5  # Minimum delay between starting two downloads, in seconds
+CHUNK_SIZE = 65536  # Bytes written per chunk while streaming an image to disk
 
-def download_image(url, filename):
+class Pacer:
+    '''Space out download starts by at least a fixed delay'''
+
+    def __init__(self, delay):
+        self.delay = delay
+        self._lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            if self._next_start > now:
+                await asyncio.sleep(self._next_start - now)
+                now = self._next_start
+            self._next_start = now + self.delay
+
+async def download_image(session, semaphore, pacer, url, filename):
     '''Download an image from URL and save to filename'''
     try:
         # Create output directory if it doesn't exist
@@ -203,23 +278,25 @@ def download_image(url, filename):
         if os.path.exists(filename):
             print(f"Skipping existing file: {{filename}}")
             return True
-            
-        # Download the image
-        response = requests.get(url, stream=True)
-        if response.status_code == 200:
-            with open(filename, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            print(f"Downloaded: {{filename}}")
-            return True
-        else:
-            print(f"Failed to download {{url}}: HTTP {{response.status_code}}")
-            return False
+        
+        # At most MAX_WORKERS downloads run at once, and their requests
+        # start at least DELAY seconds apart to be nice to the server
+        async with semaphore:
+            await pacer.wait()
+            async with session.get(url) as response:
+                if response.status != 200:
+                    print(f"Failed to download {{url}}: HTTP {{response.status}}")
+                    return False
+                async with aiofiles.open(filename, 'wb') as f:
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        await f.write(chunk)
+        print(f"Downloaded: {{filename}}")
+        return True
     except Exception as e:
         print(f"Error downloading {{url}}: {{e}}")
         return False
 
-def main():
+async def main():
     # Create output directory
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
@@ -240,22 +317,21 @@ def main():
         filename = os.path.join(OUTPUT_DIR, img['image_name'] + img['extension'])
         download_tasks.append((url, filename))
     
-    # Download images with a thread pool
-    success_count = 0
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        for i, (url, filename) in enumerate(download_tasks):
-            future = executor.submit(download_image, url, filename)
-            if future.result():
-                success_count += 1
-            
-            # Add delay between submissions to be nice to the server
-            if i < len(download_tasks) - 1:  # Don't delay after the last one
-                time.sleep(DELAY)
+    # Run all downloads concurrently on one session
+    semaphore = asyncio.Semaphore(MAX_WORKERS)
+    pacer = Pacer(DELAY)
+    connector = aiohttp.TCPConnector(limit=MAX_WORKERS)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        results = await asyncio.gather(*(
+            download_image(session, semaphore, pacer, url, filename)
+            for url, filename in download_tasks
+        ))
+    success_count = sum(results)
     
     print(f"Download complete. Successfully downloaded {{success_count}} of {{len(images)}} images.")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
 """
     
     with open(crawler_script, 'w', encoding='utf-8') as f:
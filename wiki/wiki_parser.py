@@ -2,14 +2,44 @@
 import os
 import zipfile
 import re
-from bs4 import BeautifulSoup
-import html
+from lxml import etree
+import lxml.html
 import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# numpy is only used for the column widths of very large tables
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 # Configuration
 ZIP_FILE_PATH = "/home/sai/Desktop/factorio/pratincole/wiki/wiki_xml.zip"
 OUTPUT_DIR = "/home/sai/Desktop/factorio/pratincole/wiki/parsed_wiki"
 TABLE_FORMAT = "markdown"  # can be "markdown" or "text"
+SKIP_EXISTING = True  # Leave pages already parsed by an earlier run alone
+BATCH_SIZE = 256  # Pages read from the archive per batch handed to the workers
+NUMPY_MIN_CELLS = 100_000  # Tables with more cells than this get their column widths from numpy
+
+# Patterns used for every page, compiled once
+_UNSAFE_CHARS_RE = re.compile(r'[\\/*?:"<>|]')
+_NEWLINES_RE = re.compile(r'\n+')
+_SPACES_RE = re.compile(r' +')
+_TABLE_PLACEHOLDER_RE = re.compile(r'\[\[TABLE_([1-9]\d*)\]\]')
+
+# Pages are parsed with lxml directly, decoding the raw bytes as UTF-8
+_HTML_PARSER = lxml.html.HTMLParser(encoding='utf-8')
+
+# Elements whose text is never part of the page text (BeautifulSoup keeps it
+# in separate string classes that get_text skips)
+_NON_TEXT_TAGS = ('script', 'style', 'template', 'rt', 'rp')
+
+# Whitespace handling copied from BeautifulSoup, so the extracted text stays
+# the same: outside pre and textarea, a string of only these characters
+# counts as a single newline (if it has one) or a single space
+_ASCII_SPACES = ' \n\t\f\r'
+_PRESERVE_WHITESPACE_TAGS = ('pre', 'textarea')
 
 def clean_filename(filename):
     """Clean filename to be safe for file system"""
@@ -21,44 +51,81 @@ def clean_filename(filename):
     if base_name.endswith('.html'):
         base_name = base_name[:-5]
     # Replace problematic characters
-    base_name = re.sub(r'[\\/*?:"<>|]', '_', base_name)
+    base_name = _UNSAFE_CHARS_RE.sub('_', base_name)
     return base_name + '.txt'
 
-def extract_text_from_html(html_content):
-    """Extract clean text from HTML content"""
-    soup = BeautifulSoup(html_content, 'html.parser')
+def parse(html_content):
+    """Parse a wiki page from its raw UTF-8 bytes into the tree shared by the extractors"""
+    root = etree.fromstring(html_content, _HTML_PARSER)
+    # lxml returns no tree at all for an empty page
+    if root is None:
+        return lxml.html.Element('html')
     
-    # Remove script and style elements
-    for script in soup(["script", "style"]):
-        script.extract()
+    # Blank all text inside script, style and similar elements, keeping the
+    # elements themselves and the text that follows them
+    for container in root.iter(_NON_TEXT_TAGS):
+        container.text = None
+        for element in container.iterdescendants():
+            element.text = None
+            element.tail = None
     
+    return root
+
+def get_stripped_text(element):
+    """Concatenate the stripped text pieces of an element (like BeautifulSoup's get_text(strip=True))"""
+    return ''.join(piece.strip() for piece in element.itertext())
+
+def collapse_blank_text(root):
+    """Reduce whitespace-only text to a single newline or space, except inside pre and textarea"""
+    preserved = set()
+    for element in root.iter(_PRESERVE_WHITESPACE_TAGS):
+        preserved.update(element.iter())
+    
+    for element in root.iter():
+        text = element.text
+        if text and not text.strip(_ASCII_SPACES) and element not in preserved:
+            element.text = '\n' if '\n' in text else ' '
+        tail = element.tail
+        if tail and not tail.strip(_ASCII_SPACES) and element.getparent() not in preserved:
+            element.tail = '\n' if '\n' in tail else ' '
+
+def extract_text_from_html(root):
+    """Extract clean text from a parsed HTML page (modifies the tree in place)"""
     # Process tables first, before extracting text
     tables_data = []
-    for table in soup.find_all('table'):
+    for table in list(root.iter('table')):
         tables_data.append(process_table(table))
         # Replace the table with a placeholder
-        table_placeholder = soup.new_tag('div')
-        table_placeholder.string = f"[[TABLE_{len(tables_data)}]]"
-        table.replace_with(table_placeholder)
+        table_placeholder = table.makeelement('div', {})
+        table_placeholder.text = f"[[TABLE_{len(tables_data)}]]"
+        table_placeholder.tail = table.tail
+        table.getparent().replace(table, table_placeholder)
+    
+    # Get text and clean it up. itertext walks the tree in C and, like
+    # get_text, skips comments; each text piece goes on its own line.
+    collapse_blank_text(root)
+    text = '\n'.join(root.itertext())
     
-    # Get text and clean it up
-    text = soup.get_text(separator='\n')
+    # Clean up text: remove excessive whitespace. lxml has already decoded
+    # HTML entities, so the text is not unescaped a second time.
+    text = _NEWLINES_RE.sub('\n', text)
+    text = _SPACES_RE.sub(' ', text)
     
-    # Clean up text: remove excessive whitespace, decode HTML entities
-    text = re.sub(r'\n+', '\n', text)
-    text = re.sub(r' +', ' ', text)
-    text = html.unescape(text)
+    # Add back tables where the placeholders are, in one pass over the text
+    def restore_table(match):
+        index = int(match.group(1))
+        if 1 <= index <= len(tables_data) and tables_data[index - 1].strip():
+            return f"\n\n{tables_data[index - 1]}\n\n"
+        return match.group(0)
     
-    # Add back tables where the placeholders are
-    for i, table_data in enumerate(tables_data, 1):
-        if table_data.strip():
-            text = text.replace(f"[[TABLE_{i}]]", f"\n\n{table_data}\n\n")
+    if tables_data:
+        text = _TABLE_PLACEHOLDER_RE.sub(restore_table, text)
     
     return text.strip()
 
 def process_table(table):
     """Process an HTML table into a text format"""
-    rows = table.find_all('tr')
+    rows = list(table.iter('tr'))
     if not rows:
         return ""
     
@@ -69,14 +136,14 @@ def process_table(table):
     for row in rows:
         row_data = []
         # Handle both header and data cells
-        cells = row.find_all(['th', 'td'])
+        cells = row.iter('th', 'td')
         for cell in cells:
             # Get colspan to repeat the cell content
             colspan = int(cell.get('colspan', 1))
             rowspan = int(cell.get('rowspan', 1))
             
             # Get cell text
-            cell_text = cell.get_text(strip=True).replace('\n', ' ')
+            cell_text = get_stripped_text(cell).replace('\n', ' ')
             
             # Add the cell data according to colspan
             for _ in range(colspan):
@@ -103,27 +170,25 @@ def format_table_markdown(table_data):
     if not table_data or not table_data[0]:
         return ""
     
-    # Calculate column widths
-    col_widths = [0] * len(table_data[0])
-    for row in table_data:
-        for i, cell in enumerate(row):
-            col_widths[i] = max(col_widths[i], len(str(cell)))
+    # Convert each cell to a string once
+    rows = [[str(cell) for cell in row] for row in table_data]
     
-    # Build the table
-    result = []
-    
-    # Header row
-    header = "| " + " | ".join(str(cell).ljust(width) for cell, width in zip(table_data[0], col_widths)) + " |"
-    result.append(header)
+    # Calculate column widths. For very large tables a column-wise max over
+    # an array of cell lengths is faster than transposing the rows with zip;
+    # below NUMPY_MIN_CELLS the plain loop wins.
+    num_cols = len(rows[0])
+    if np is not None and len(rows) * num_cols > NUMPY_MIN_CELLS:
+        lengths = np.fromiter((len(cell) for row in rows for cell in row), dtype=np.int32, count=len(rows) * num_cols)
+        col_widths = lengths.reshape(len(rows), num_cols).max(axis=0).tolist()
+    else:
+        col_widths = [max(map(len, column)) for column in zip(*rows)]
     
-    # Separator row
-    separator = "| " + " | ".join("-" * width for width in col_widths) + " |"
-    result.append(separator)
+    def format_row(cells):
+        return "| " + " | ".join(cell.ljust(width) for cell, width in zip(cells, col_widths)) + " |"
     
-    # Data rows
-    for row in table_data[1:]:
-        data_row = "| " + " | ".join(str(cell).ljust(width) for cell, width in zip(row, col_widths)) + " |"
-        result.append(data_row)
+    # Header row, separator row, then the data rows
+    result = [format_row(rows[0]), "| " + " | ".join("-" * width for width in col_widths) + " |"]
+    result.extend(format_row(row) for row in rows[1:])
     
     return "\n".join(result)
 
@@ -142,9 +207,8 @@ def format_table_text(table_data):
     result.append("TABLE END")
     return "\n".join(result)
 
-def extract_metadata(html_content):
-    """Extract metadata from the HTML content"""
-    soup = BeautifulSoup(html_content, 'html.parser')
+def extract_metadata(root):
+    """Extract metadata from a parsed HTML page"""
     metadata = {
         "title": "",
         "categories": [],
@@ -152,27 +216,76 @@ def extract_metadata(html_content):
     }
     
     # Extract title
-    title_tag = soup.find('title')
-    if title_tag:
-        metadata["title"] = title_tag.get_text(strip=True)
-    
-    # Extract categories
-    category_links = soup.find_all('a', href=re.compile(r'Category:'))
-    for link in category_links:
-        category = link.get_text(strip=True)
-        if category:
-            metadata["categories"].append(category)
-    
-    # Extract internal links
-    internal_links = soup.find_all('a', href=re.compile(r'^[^http]'))
-    for link in internal_links:
-        href = link.get('href', '')
-        text = link.get_text(strip=True)
-        if href and text and not href.startswith('#') and not 'Category:' in href:
-            metadata["links"].append({"text": text, "href": href})
+    title_tag = next(root.iter('title'), None)
+    if title_tag is not None:
+        metadata["title"] = get_stripped_text(title_tag)
+    
+    # Extract categories and internal links in a single pass over the links
+    for link in root.iter('a'):
+        href = link.get('href')
+        if href is None:
+            continue
+        if 'Category:' in href:
+            category = get_stripped_text(link)
+            if category:
+                metadata["categories"].append(category)
+        # Internal links: same test as the old ^[^http] pattern (first char not h, t or p)
+        elif href and href[0] not in 'htp' and href[0] != '#':
+            text = get_stripped_text(link)
+            if text:
+                metadata["links"].append({"text": text, "href": href})
     
     return metadata
 
+def process_html_file(filename, raw_content):
+    """Parse one HTML file from the archive and save it as a text file"""
+    # Parse once and share the tree. Metadata goes first because
+    # text extraction removes tables from the tree. The raw
+    # bytes go straight to lxml, which decodes them as UTF-8 itself.
+    root = parse(raw_content)
+    metadata = extract_metadata(root)
+    clean_text = extract_text_from_html(root)
+    
+    # Save to file
+    output_filename = clean_filename(filename)
+    output_path = os.path.join(OUTPUT_DIR, output_filename)
+    
+    # Metadata as JSON at the top, then the content, in a single write.
+    # The file is written under a temporary name and renamed into place,
+    # so a run killed mid-write never leaves a truncated page that later
+    # runs would skip as already parsed.
+    metadata_json = json.dumps(metadata, indent=2, ensure_ascii=False)
+    tmp_path = f"{output_path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8', buffering=65536) as out_file:
+        out_file.write(f"---\n{metadata_json}\n---\n\n{clean_text}")
+    os.replace(tmp_path, output_path)
+    
+    return output_filename
+
+def map_html_files(executor, process_file, zip_ref, file_list):
+    """Yield (filename, process_file(filename, content)) for each readable listed file, in order"""
+    # Members are read here (ZipFile isn't safe to share with workers) one
+    # batch at a time. The next batch is read while the workers parse the
+    # current one, so at most two batches of raw pages are held in memory.
+    pending = deque()
+    for start in range(0, len(file_list), BATCH_SIZE):
+        batch = []
+        contents = []
+        for filename in file_list[start:start + BATCH_SIZE]:
+            # A corrupt member (like a bad CRC) only skips that file
+            try:
+                contents.append(zip_ref.read(filename))
+            except Exception as e:
+                print(f"Error processing file {filename}: {e}")
+                continue
+            batch.append(filename)
+        pending.append(zip(batch, executor.map(process_file, batch, contents, chunksize=16)))
+        if len(pending) > 1:
+            yield from pending.popleft()
+    
+    while pending:
+        yield from pending.popleft()
+
 def process_wiki_files():
     """Process all HTML files in the ZIP archive"""
     # Create output directory if it doesn't exist
@@ -185,35 +298,21 @@ def process_wiki_files():
         
         print(f"Found {len(file_list)} HTML files to process")
         
-        for i, filename in enumerate(file_list):
-            if i % 100 == 0:
-                print(f"Processing file {i+1}/{len(file_list)}: {filename}")
-            
-            # Read file content
-            with zip_ref.open(filename) as file:
-                html_content = file.read().decode('utf-8', errors='replace')
-            
-            # Extract text and metadata
-            clean_text = extract_text_from_html(html_content)
-            metadata = extract_metadata(html_content)
-            
-            # Create output data
-            output_data = {
-                "metadata": metadata,
-                "content": clean_text
-            }
-            
-            # Save to file
-            output_filename = clean_filename(filename)
-            output_path = os.path.join(OUTPUT_DIR, output_filename)
-            
-            with open(output_path, 'w', encoding='utf-8') as out_file:
-                # Write metadata as JSON at the top
-                out_file.write("---\n")
-                out_file.write(json.dumps(metadata, indent=2, ensure_ascii=False))
-                out_file.write("\n---\n\n")
-                # Write content
-                out_file.write(clean_text)
+        # List the output directory once and drop the pages already parsed
+        if SKIP_EXISTING:
+            existing = set(os.listdir(OUTPUT_DIR))
+            if existing:
+                total_files = len(file_list)
+                file_list = [f for f in file_list if clean_filename(f) not in existing]
+                print(f"Skipping {total_files - len(file_list)} files already parsed")
+        
+        # The archive is read in this process and the CPU-bound parsing
+        # and writing is spread over a process pool
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            results = map_html_files(executor, process_html_file, zip_ref, file_list)
+            for i, (filename, _) in enumerate(results):
+                if i % 100 == 0:
+                    print(f"Processed file {i+1}/{len(file_list)}: {filename}")
 
 if __name__ == "__main__":
     print(f"Starting wiki parser...")